@@ -1,3 +1,4 @@
+import re
 import json
 import requests
 import hashlib
@@ -6,6 +7,7 @@ import logging
 from datetime import datetime
 from typing import Optional, Any, Tuple
 
+import orjson
 from google.cloud import storage, secretmanager
 from google.cloud import pubsub_v1
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
@@ -23,6 +25,7 @@ PROJECT_ID = os.environ['PROJECT_ID']
 SOURCE_IDENTIFIER = os.environ['SOURCE_IDENTIFIER']
 VERSION_CONTROL = os.environ['VERSION_CONTROL']
 PUBSUB_TOPIC = os.environ['PUBSUB_TOPIC']
+WEBHOOK_FILENAME_RE = re.compile(r"(\d{8}T\d{6})-([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.json$")
 
 storage_client = storage.Client()
 publisher = pubsub_v1.PublisherClient()
@@ -60,7 +63,7 @@ def make_api_call(url: str) -> dict:
         logger.debug(f"Making API call to: {sanitized_url}")
         response = requests.get(url)
         response.raise_for_status()
-        json_data = response.json()
+        json_data = orjson.loads(response.content)
 
         validate_json_payload(json_data)
 
@@ -95,7 +98,7 @@ def read_webhook_payload(bucket_name: str, file_name: str) -> dict:
         logger.debug(f"Reading webhook payload from bucket: {bucket_name}, file: {file_name}")
         bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(file_name)
-        return json.loads(blob.download_as_string(client=None))
+        return orjson.loads(blob.download_as_bytes())
     except Exception as e:
         logger.exception(f"Failed to read webhook payload: {e}")
         raise
@@ -131,6 +134,11 @@ def process_webhook_payload(event: dict, context: Any) -> None:
 
 def extract_payload_details(event: dict) -> Optional[Tuple[str, str, str]]:
     file_name = event['name']
+    match = WEBHOOK_FILENAME_RE.search(file_name)
+    if not match:
+        logger.warning(f"Skipping {file_name}: filename does not end in <timestamp>-<uuid>.json")
+        return None
+
     webhook_payload = read_webhook_payload(event['bucket'], file_name)
     dados_id = webhook_payload.get('dados', {}).get('id')
 
@@ -138,8 +146,8 @@ def extract_payload_details(event: dict) -> Optional[Tuple[str, str, str]]:
         logger.warning("dados.id not found in webhook payload")
         return None
 
-    parts = file_name.rstrip('.json').split('-')
-    return dados_id, parts[-6], '-'.join(parts[-5:])
+    timestamp, uuid_str = match.groups()
+    return dados_id, timestamp, uuid_str
 
 
 def process_pdv_pedido_data(dados_id: str, timestamp: str, uuid_str: str, token: str) -> Tuple[dict, str, list]:
@@ -267,7 +275,7 @@ def store_payload(data: dict, filename_template: str, folder_path: str, metadata
         bucket = storage_client.bucket(TARGET_BUCKET_NAME)
         blob = bucket.blob(file_path)
         blob.metadata = full_metadata
-        blob.upload_from_string(json.dumps(data), content_type='application/json')
+        blob.upload_from_string(orjson.dumps(data), content_type='application/json')
         logger.debug(f"Payload stored with metadata: {full_metadata}")
     except Exception as e:
         logger.exception(f"Failed to store payload in GCS: {e}")
@@ -283,9 +291,8 @@ def publish_notification(topic_path: str, pdv_pedido_data: dict, produto_payload
             'timestamp': timestamp,
             'uuid': uuid_str
         }
-        serialized_message = json.dumps(message, ensure_ascii=False)
-        payload = serialized_message.encode('utf-8')
-        logger.info(f"Notification published to {topic_path} with message: {serialized_message}")
+        payload = orjson.dumps(message)
+        logger.info(f"Notification published to {topic_path} with message: {payload.decode('utf-8')}")
         future = publisher.publish(topic_path, data=payload)
         future.result()
     except Exception as e:
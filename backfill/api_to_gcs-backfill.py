@@ -1,4 +1,6 @@
+import re
 import json
+import orjson
 import requests
 import uuid
 import hashlib
@@ -18,6 +20,7 @@ SECRET_PATH = "projects/559935551835/secrets/z316-tiny-token-api/versions/latest
 SLEEP_TIME = 3
 PUBSUB_TOPIC = 'projects/emporio-zingaro/topics/api-to-gcs_DONE'
 SLEEP_INTERVAL = 0.2
+BR_DATE_RE = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
 
 PROJECT_ID = "z316-sales-data-pipeline"
 SOURCE_IDENTIFIER = "backfill"
@@ -56,7 +59,7 @@ def make_api_call(url):
         print_message(f"Making API call to: {sanitized_url}")
         response = requests.get(url)
         response.raise_for_status()
-        json_data = response.json()
+        json_data = orjson.loads(response.content)
 
         validate_json_payload(json_data)
 
@@ -112,22 +115,18 @@ def store_payload(data, filename_template, folder_path, metadata):
         bucket = storage_client.bucket(TARGET_BUCKET_NAME)
         blob = bucket.blob(file_path)
         blob.metadata = full_metadata
-        blob.upload_from_string(json.dumps(data), content_type='application/json')
+        blob.upload_from_string(orjson.dumps(data), content_type='application/json')
         print_message(f"Payload stored with metadata: {full_metadata}")
     except Exception as e:
         print_message(f"Failed to store payload in GCS: {e}")
 
 def is_pedido_processed_just_in_time(dados_id):
-    search_pattern = f"-{dados_id}-"
-    blobs = storage_client.list_blobs(TARGET_BUCKET_NAME)
-    for blob in blobs:
-        if search_pattern in blob.name:
-            return True
-    return False
+    blobs = storage_client.list_blobs(TARGET_BUCKET_NAME, match_glob=f"**-{dados_id}-**", max_results=1, fields="items(name),nextPageToken")
+    return next(iter(blobs), None) is not None
 
 def fetch_and_extract_dados_ids():
     all_dados_ids = set()
-    blobs = storage_client.list_blobs(TARGET_BUCKET_NAME)
+    blobs = storage_client.list_blobs(TARGET_BUCKET_NAME, fields="items(name),nextPageToken")
     for blob in blobs:
         parts = blob.name.split('-')
         if len(parts) > 1:
@@ -136,7 +135,11 @@ def fetch_and_extract_dados_ids():
     return all_dados_ids
 
 def generate_timestamp_and_uuid(data_pedido):
-    timestamp = datetime.strptime(data_pedido, "%d/%m/%Y").strftime("%Y%m%dT000000")
+    match = BR_DATE_RE.fullmatch(data_pedido or '')
+    if not match:
+        raise ValueError(f"Unexpected data_pedido format: {data_pedido!r}")
+    day, month, year = match.groups()
+    timestamp = f"{year}{month}{day}T000000"
     return timestamp, str(uuid.uuid4())
 
 def fetch_pdv_pedido_data(dados_id, token):
@@ -162,11 +165,10 @@ def create_pubsub_message(pdv_pedido_data, produto_data, pedidos_pesquisa_data,
 
 def publish_message(topic_name, message):
     try:
-        serialized_message = json.dumps(message, ensure_ascii=False)
-        payload = serialized_message.encode('utf-8')
+        payload = orjson.dumps(message)
         future = pubsub_publisher.publish(topic_name, data=payload)
         future.result()
-        print_message(f"Notification published to {topic_name} with message: {serialized_message}", context="publish_message")
+        print_message(f"Notification published to {topic_name} with message: {payload.decode('utf-8')}", context="publish_message")
         time.sleep(SLEEP_INTERVAL)
     except Exception as e:
         print_message(f"Failed to publish notification: {e}", context="publish_message")
@@ -1,14 +1,21 @@
+import io
 import re
-import json
 import logging
+import tempfile
 from time import sleep
 
+import orjson
 from google.cloud import pubsub_v1, storage
+from google.cloud.storage import transfer_manager
 
 BUCKET_NAME = 'z316-tiny-api'
 PUBSUB_TOPIC = 'projects/emporio-zingaro/topics/api-to-gcs_DONE'
-FILENAME_PATTERN = r"z316-tiny-api-\d+-(produto|pdv|pesquisa)(-\d+)?-(\d{8}T\d{6})-([a-f0-9-]+)\.json"
+FILENAME_PATTERN = r"z316-tiny-api-\d+-(produto|pdv|pesquisa)(?:-(\d+))?-(\d{8}T\d{6})-([a-f0-9-]+)\.json"
+FILENAME_RE = re.compile(FILENAME_PATTERN)
 SLEEP_INTERVAL = 0.2
+LARGE_BLOB_THRESHOLD = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+DOWNLOAD_MAX_WORKERS = 5
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 storage_client = storage.Client()
@@ -18,12 +25,12 @@ bucket = storage_client.bucket(BUCKET_NAME)
 
 def parse_filename(full_path):
     filename = full_path.split('/')[-1]
-    match = re.search(FILENAME_PATTERN, filename)
+    match = FILENAME_RE.fullmatch(filename)
     if match:
         product_type = match.group(1)
         timestamp_str = match.group(3)
         uuid = match.group(4)
-        product_id = match.group(2)[1:] if product_type == 'produto' else None
+        product_id = match.group(2) if product_type == 'produto' else None
         logging.debug(f"File parsed successfully: Type={product_type}, Timestamp={timestamp_str}, UUID={uuid}, ProductID={product_id}, Filename={filename}")
         return product_type, timestamp_str, uuid, product_id
     else:
@@ -31,16 +38,27 @@ def parse_filename(full_path):
         return None, None, None, None
 
 
+def download_blob_json(blob):
+    if blob.size and blob.size > LARGE_BLOB_THRESHOLD:
+        logging.debug(f"Downloading large blob {blob.name} ({blob.size} bytes) in concurrent chunks")
+        with tempfile.NamedTemporaryFile() as tmp:
+            transfer_manager.download_chunks_concurrently(blob, tmp.name, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                                                          max_workers=DOWNLOAD_MAX_WORKERS,
+                                                          worker_type=transfer_manager.THREAD)
+            with open(tmp.name, 'rb') as downloaded:
+                return orjson.loads(downloaded.read())
+    buffer = io.BytesIO()
+    blob.download_to_file(buffer, raw_download=True)
+    return orjson.loads(buffer.getbuffer())
+
+
 def create_pubsub_message(pdv_content, pesquisa_content, produto_contents, timestamp, uuid):
-    produto_data = []
-    for content, _ in produto_contents:
-        produto = json.loads(content)
-        produto_data.append(produto)
+    produto_data = [content for content, _ in produto_contents]
 
     message = {
-        "pdv_pedido_data": json.loads(pdv_content),
+        "pdv_pedido_data": pdv_content,
         "produto_data": produto_data,
-        "pedidos_pesquisa_data": json.loads(pesquisa_content),
+        "pedidos_pesquisa_data": pesquisa_content,
         "nota_fiscal_link_data": {"retorno": {"status_processamento": "3", "status": "OK", "link_nfe": ""}},
         "timestamp": timestamp,
         "uuid": uuid
@@ -51,11 +69,10 @@ def create_pubsub_message(pdv_content, pesquisa_content, produto_contents, times
 
 def publish_message(topic_name, message):
     try:
-        serialized_message = json.dumps(message, ensure_ascii=False)
-        payload = serialized_message.encode('utf-8')
+        payload = orjson.dumps(message)
         future = pubsub_publisher.publish(topic_name, data=payload)
         future.result()
-        logging.info(f"Notification published to {topic_name} with message: {serialized_message}")
+        logging.info(f"Notification published to {topic_name} with message: {payload.decode('utf-8')}")
         sleep(SLEEP_INTERVAL)
     except Exception as e:
         logging.exception(f"Failed to publish notification: {e}")
@@ -66,8 +83,10 @@ def process_folder(folder_name):
     pdv_content = pesquisa_content = timestamp = uuid = None
     produto_contents = []
     for blob in blobs:
-        content = blob.download_as_text()
         product_type, timestamp_str, file_uuid, product_id = parse_filename(blob.name)
+        if not product_type:
+            continue
+        content = download_blob_json(blob)
         if product_type == 'pdv':
             pdv_content = content
             timestamp = timestamp_str
@@ -85,7 +104,7 @@ def process_folder(folder_name):
 
 def main():
     logging.info("Starting file processing...")
-    folders = set(blob.name.split('/')[0] for blob in bucket.list_blobs())
+    folders = set(blob.name.split('/')[0] for blob in bucket.list_blobs(fields="items(name),nextPageToken"))
     for folder_name in folders:
         logging.info(f"Processing folder: {folder_name}")
         process_folder(folder_name)
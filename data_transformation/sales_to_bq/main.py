@@ -1,9 +1,11 @@
 import os
-import json
+import re
 import base64
 import logging
 from datetime import datetime
+from functools import lru_cache
 
+import orjson
 from google.cloud import bigquery
 from google.api_core import retry
 
@@ -13,77 +15,82 @@ client = bigquery.Client()
 PEDIDOS_TABLE_ID = os.environ.get('PEDIDOS_TABLE_ID')
 ITENS_PEDIDO_TABLE_ID = os.environ.get('ITENS_PEDIDO_TABLE_ID')
 SOURCE_ID = os.environ.get('SOURCE_ID')
-
-pedidos_schema = [
-    bigquery.SchemaField("uuid", "STRING"),
-    bigquery.SchemaField("timestamp", "STRING"),
-    bigquery.SchemaField("pedido_dia", "DATE"),
-    bigquery.SchemaField("pedido_id", "STRING"),
-    bigquery.SchemaField("pedido_numero", "STRING"),
-    bigquery.SchemaField("cliente_nome", "STRING"),
-    bigquery.SchemaField("cliente_cpf", "STRING"),
-    bigquery.SchemaField("cliente_email", "STRING"),
-    bigquery.SchemaField("cliente_celular", "STRING"),
-    bigquery.SchemaField("vendedor_nome", "STRING"),
-    bigquery.SchemaField("vendedor_id", "STRING"),
-    bigquery.SchemaField("valor_produtos_custo", "FLOAT"),
-    bigquery.SchemaField("valor_produtos_sem_desconto", "FLOAT"),
-    bigquery.SchemaField("desconto_produtos", "FLOAT"),
-    bigquery.SchemaField("desconto_pedido", "FLOAT"),
-    bigquery.SchemaField("desconto_total", "FLOAT"),
-    bigquery.SchemaField("valor_faturado", "FLOAT"),
-    bigquery.SchemaField("valor_lucro", "FLOAT"),
-    bigquery.SchemaField("forma_pagamento", "STRING"),
-    bigquery.SchemaField("source_id", "STRING"),
-    bigquery.SchemaField("processed_timestamp", "TIMESTAMP")
+BR_DATE_RE = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
+
+known_tables = {}
+
+pedidos_schema_definition = [
+    {"name": "uuid", "type": "STRING"},
+    {"name": "timestamp", "type": "STRING"},
+    {"name": "pedido_dia", "type": "DATE"},
+    {"name": "pedido_id", "type": "STRING"},
+    {"name": "pedido_numero", "type": "STRING"},
+    {"name": "cliente_nome", "type": "STRING"},
+    {"name": "cliente_cpf", "type": "STRING"},
+    {"name": "cliente_email", "type": "STRING"},
+    {"name": "cliente_celular", "type": "STRING"},
+    {"name": "vendedor_nome", "type": "STRING"},
+    {"name": "vendedor_id", "type": "STRING"},
+    {"name": "valor_produtos_custo", "type": "FLOAT"},
+    {"name": "valor_produtos_sem_desconto", "type": "FLOAT"},
+    {"name": "desconto_produtos", "type": "FLOAT"},
+    {"name": "desconto_pedido", "type": "FLOAT"},
+    {"name": "desconto_total", "type": "FLOAT"},
+    {"name": "valor_faturado", "type": "FLOAT"},
+    {"name": "valor_lucro", "type": "FLOAT"},
+    {"name": "forma_pagamento", "type": "STRING"},
+    {"name": "source_id", "type": "STRING"},
+    {"name": "processed_timestamp", "type": "TIMESTAMP"}
 ]
 
-itens_pedido_schema = [
-    bigquery.SchemaField("uuid", "STRING"),
-    bigquery.SchemaField("timestamp", "STRING"),
-    bigquery.SchemaField("pedido_dia", "DATE"),
-    bigquery.SchemaField("pedido_id", "STRING"),
-    bigquery.SchemaField("pedido_numero", "STRING"),
-    bigquery.SchemaField("cliente_nome", "STRING"),
-    bigquery.SchemaField("cliente_cpf", "STRING"),
-    bigquery.SchemaField("cliente_email", "STRING"),
-    bigquery.SchemaField("cliente_celular", "STRING"),
-    bigquery.SchemaField("vendedor_nome", "STRING"),
-    bigquery.SchemaField("vendedor_id", "STRING"),
-    bigquery.SchemaField("produto_id", "STRING"),
-    bigquery.SchemaField("produto_nome", "STRING"),
-    bigquery.SchemaField("produto_categoria_principal", "STRING"),
-    bigquery.SchemaField("produto_categoria_secundaria", "STRING"),
-    bigquery.SchemaField("produto_valor_custo_und", "FLOAT"),
-    bigquery.SchemaField("produto_valor_sem_desconto_und", "FLOAT"),
-    bigquery.SchemaField("produto_valor_com_desconto_und", "FLOAT"),
-    bigquery.SchemaField("produto_valor_lucro_und", "FLOAT"),
-    bigquery.SchemaField("desconto_produto_und", "FLOAT"),
-    bigquery.SchemaField("desconto_pedido_und", "FLOAT"),
-    bigquery.SchemaField("desconto_total_und", "FLOAT"),
-    bigquery.SchemaField("produto_quantidade", "FLOAT"),
-    bigquery.SchemaField("desconto_produto", "FLOAT"),
-    bigquery.SchemaField("desconto_pedido", "FLOAT"),
-    bigquery.SchemaField("desconto_total", "FLOAT"),
-    bigquery.SchemaField("total_produto_valor_custo", "FLOAT"),
-    bigquery.SchemaField("total_produto_valor_sem_desconto", "FLOAT"),
-    bigquery.SchemaField("total_produto_valor_faturado", "FLOAT"),
-    bigquery.SchemaField("total_produto_valor_lucro", "FLOAT"),
-    bigquery.SchemaField("forma_pagamento", "STRING"),
-    bigquery.SchemaField("source_id", "STRING"),
-    bigquery.SchemaField("processed_timestamp", "TIMESTAMP")
+itens_pedido_schema_definition = [
+    {"name": "uuid", "type": "STRING"},
+    {"name": "timestamp", "type": "STRING"},
+    {"name": "pedido_dia", "type": "DATE"},
+    {"name": "pedido_id", "type": "STRING"},
+    {"name": "pedido_numero", "type": "STRING"},
+    {"name": "cliente_nome", "type": "STRING"},
+    {"name": "cliente_cpf", "type": "STRING"},
+    {"name": "cliente_email", "type": "STRING"},
+    {"name": "cliente_celular", "type": "STRING"},
+    {"name": "vendedor_nome", "type": "STRING"},
+    {"name": "vendedor_id", "type": "STRING"},
+    {"name": "produto_id", "type": "STRING"},
+    {"name": "produto_nome", "type": "STRING"},
+    {"name": "produto_categoria_principal", "type": "STRING"},
+    {"name": "produto_categoria_secundaria", "type": "STRING"},
+    {"name": "produto_valor_custo_und", "type": "FLOAT"},
+    {"name": "produto_valor_sem_desconto_und", "type": "FLOAT"},
+    {"name": "produto_valor_com_desconto_und", "type": "FLOAT"},
+    {"name": "produto_valor_lucro_und", "type": "FLOAT"},
+    {"name": "desconto_produto_und", "type": "FLOAT"},
+    {"name": "desconto_pedido_und", "type": "FLOAT"},
+    {"name": "desconto_total_und", "type": "FLOAT"},
+    {"name": "produto_quantidade", "type": "FLOAT"},
+    {"name": "desconto_produto", "type": "FLOAT"},
+    {"name": "desconto_pedido", "type": "FLOAT"},
+    {"name": "desconto_total", "type": "FLOAT"},
+    {"name": "total_produto_valor_custo", "type": "FLOAT"},
+    {"name": "total_produto_valor_sem_desconto", "type": "FLOAT"},
+    {"name": "total_produto_valor_faturado", "type": "FLOAT"},
+    {"name": "total_produto_valor_lucro", "type": "FLOAT"},
+    {"name": "forma_pagamento", "type": "STRING"},
+    {"name": "source_id", "type": "STRING"},
+    {"name": "processed_timestamp", "type": "TIMESTAMP"}
 ]
 
 
+@lru_cache(maxsize=4096)
 def transform_date_format(date_str: str) -> str:
     logging.debug(f"Transforming date format for: {date_str}")
-    try:
-        transformed_date = datetime.strptime(date_str, "%d/%m/%Y").strftime("%Y-%m-%d")
+    match = BR_DATE_RE.fullmatch(date_str)
+    if match:
+        day, month, year = match.groups()
+        transformed_date = f"{year}-{month}-{day}"
         logging.info(f"Transformed date: {transformed_date}")
         return transformed_date
-    except ValueError as e:
-        logging.error(f"Error transforming date format: {e}, returning original date string.")
-        return date_str
+    logging.error(f"Error transforming date format: unexpected value {date_str!r}, returning original date string.")
+    return date_str
 
 
 def calculate_total_product_cost(produto_data, pdv_pedido_data):
@@ -290,11 +297,14 @@ def create_itens_pedido_row(uuid, timestamp, pedido_dia, pedido_numero, pedido_i
     ]
 
 
-def create_table_if_not_exists(table_id, schema, partition_field, clustering_fields):
+def create_table_if_not_exists(table_id, schema_definition, partition_field, clustering_fields):
+    if table_id in known_tables:
+        return
     try:
         table = client.get_table(table_id)
         logging.info(f"Table {table_id} already exists.")
     except Exception as e:
+        schema = [bigquery.SchemaField.from_api_repr(field) for field in schema_definition]
         logging.info(f"Table {table_id} does not exist. Creating table with schema: {schema}")
         table = bigquery.Table(table_id, schema=schema)
         table.time_partitioning = bigquery.TimePartitioning(
@@ -304,10 +314,11 @@ def create_table_if_not_exists(table_id, schema, partition_field, clustering_fie
         table.clustering_fields = clustering_fields
         table = client.create_table(table)
         logging.info(f"Table {table_id} created successfully.")
+    known_tables[table_id] = table
 
 
 def insert_rows_to_table(table_id, rows):
-    table = client.get_table(table_id)
+    table = known_tables.get(table_id) or client.get_table(table_id)
     errors = client.insert_rows(table, rows)
     if errors:
         raise Exception(f"Error inserting rows into {table_id}: {errors}")
@@ -316,8 +327,7 @@ def insert_rows_to_table(table_id, rows):
 
 
 def process_pubsub_message(event, context):
-    pubsub_message = base64.b64decode(event['data']).decode('utf-8')
-    message_data = json.loads(pubsub_message)
+    message_data = orjson.loads(base64.b64decode(event['data']))
     logging.debug(f"Received message data: {message_data}")
     uuid = message_data['uuid']
     timestamp = message_data['timestamp']
@@ -358,8 +368,8 @@ def process_pubsub_message(event, context):
                                      valor_produtos_sem_desconto, total_desconto_produtos, desconto_pedido, desconto_total,
                                      valor_faturado, valor_lucro, forma_pagamento, SOURCE_ID, processed_timestamp)
     pedidos_clustering_fields = ["pedido_id", "cliente_cpf", "vendedor_id", "forma_pagamento"]
-    create_table_if_not_exists(PEDIDOS_TABLE_ID, pedidos_schema, "pedido_dia", pedidos_clustering_fields)
+    create_table_if_not_exists(PEDIDOS_TABLE_ID, pedidos_schema_definition, "pedido_dia", pedidos_clustering_fields)
     itens_pedido_clustering_fields = ["pedido_id", "produto_id", "cliente_cpf", "vendedor_id"]
-    create_table_if_not_exists(ITENS_PEDIDO_TABLE_ID, itens_pedido_schema, "pedido_dia", itens_pedido_clustering_fields)
+    create_table_if_not_exists(ITENS_PEDIDO_TABLE_ID, itens_pedido_schema_definition, "pedido_dia", itens_pedido_clustering_fields)
     insert_rows_to_table(PEDIDOS_TABLE_ID, [pedidos_row])
     insert_rows_to_table(ITENS_PEDIDO_TABLE_ID, itens_pedido_rows)
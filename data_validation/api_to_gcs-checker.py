@@ -1,6 +1,6 @@
-import json
 import re
 import logging
+import orjson
 from google.cloud import storage, bigquery
 from tenacity import retry, stop_after_attempt, wait_exponential
 
@@ -10,6 +10,9 @@ logger = logging.getLogger()
 BUCKET_NAME = "z316-tiny-api"
 DRY_RUN = False
 BIGQUERY_DATASET = "emporio-zingaro.z316_tiny_raw_json"
+VERIFICATION_MAX_BYTES_BILLED = 1024 ** 3
+UUID_RE = re.compile(r"([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})")
+DADOS_ID_RE = re.compile(r"\d+T\d+-(\d+)-")
 
 storage_client = storage.Client()
 bigquery_client = bigquery.Client()
@@ -19,21 +22,30 @@ processed_folders = set()
 
 all_blobs = list(storage_client.list_blobs(BUCKET_NAME))
 
+def index_blobs_by_folder(blobs):
+    blobs_by_folder = {}
+    for blob in blobs:
+        blobs_by_folder.setdefault(blob.name.split('/')[0], []).append(blob)
+    return blobs_by_folder
+
+blobs_by_folder = index_blobs_by_folder(all_blobs)
+
 def list_folders():
-    folders = {blob.name.split('/')[0] for blob in all_blobs}
+    folders = set(blobs_by_folder)
     logger.info(f"Found {len(folders)} folders to process.")
     return folders
 
 def find_files(folder_name, file_type):
-    target_file = next((blob for blob in all_blobs if file_type in blob.name and blob.name.startswith(folder_name)), None)
+    target_file = next((blob for blob in blobs_by_folder.get(folder_name, []) if file_type in blob.name), None)
     log_action = "Found" if target_file else "No"
     log_level = logger.info if target_file else logger.warning
     log_level(f"[{'DRY RUN - ' if DRY_RUN else ''}{log_action}] {file_type} file in folder: {folder_name}")
     return target_file
 
-def extract_ids(blob, id_type):
-    content = blob.download_as_text()
-    data = json.loads(content)
+def load_payload(blob):
+    return orjson.loads(blob.download_as_bytes())
+
+def extract_ids(blob, data, id_type):
     ids = set()
     if id_type == 'produto':
         ids = {item.get('idProduto') for item in data.get('retorno', {}).get('pedido', {}).get('itens', [])}
@@ -70,15 +82,16 @@ def check_files(folder_name):
         processed_folders.add(folder_name)
         return False
 
-    pdv_ids = extract_ids(pdv_file, 'pedido')
-    pesquisa_ids = extract_ids(pesquisa_file, 'pedido')
+    pdv_data = load_payload(pdv_file)
+    pdv_ids = extract_ids(pdv_file, pdv_data, 'pedido')
+    pesquisa_ids = extract_ids(pesquisa_file, load_payload(pesquisa_file), 'pedido')
     if pdv_ids != pesquisa_ids:
         uuid = extract_uuid(folder_name)
         summary_entries.append({'Folder': folder_name, 'UUID': uuid, 'Action': "Delete", 'Reason': "Mismatched IDs"})
         processed_folders.add(folder_name)
         return False
 
-    produto_ids = extract_ids(pdv_file, 'produto')
+    produto_ids = extract_ids(pdv_file, pdv_data, 'produto')
     if not verify_produto_files(folder_name, produto_ids):
         uuid = extract_uuid(folder_name)
         summary_entries.append({'Folder': folder_name, 'UUID': uuid, 'Action': "Delete", 'Reason': "Missing Produto Files"})
@@ -89,7 +102,7 @@ def check_files(folder_name):
     return True
 
 def extract_uuid(folder_name):
-    match = re.search(r"([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})", folder_name)
+    match = UUID_RE.search(folder_name)
     return match.group(1) if match else None
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
@@ -98,18 +111,17 @@ def delete_blob(blob):
         blob.delete()
 
 def delete_folder(folder_name):
-    blobs = [blob for blob in all_blobs if blob.name.startswith(folder_name)]
-    for blob in blobs:
+    for blob in blobs_by_folder.get(folder_name, []):
         logger.warning(f"[{'DRY RUN - ' if DRY_RUN else ''}Deleting file] {blob.name}")
         delete_blob(blob)
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def execute_bigquery(query):
+def execute_bigquery(query, job_config=None):
     if DRY_RUN:
         logger.warning(f"[DRY RUN] Would execute query: {query}")
-        return iter([[0]])
+        return iter([])
     else:
-        return bigquery_client.query(query).result()
+        return bigquery_client.query(query, job_config=job_config).result()
 
 def delete_bigquery_records(uuid, folder_name):
     tables = ["pdv", "pesquisa", "produto"]
@@ -118,14 +130,15 @@ def delete_bigquery_records(uuid, folder_name):
         execute_bigquery(deletion_query)
         logger.warning(f"[{'DRY RUN - ' if DRY_RUN else ''}Deleting BigQuery records] from {table} with UUID: {uuid}")
 
-        verification_query = f"SELECT COUNT(*) FROM `{BIGQUERY_DATASET}.{table}` WHERE uuid = '{uuid}'"
-        result = execute_bigquery(verification_query)
-        count = next(iter(result), [0])[0]
+        verification_query = f"SELECT 1 FROM `{BIGQUERY_DATASET}.{table}` WHERE uuid = '{uuid}' LIMIT 1"
+        verification_config = bigquery.QueryJobConfig(maximum_bytes_billed=VERIFICATION_MAX_BYTES_BILLED)
+        result = execute_bigquery(verification_query, verification_config)
+        exists = next(iter(result), None) is not None
 
-        if count == 0:
+        if not exists:
             logger.info(f"[{'DRY RUN - ' if DRY_RUN else ''}Verified deletion] from {table} with UUID: {uuid}")
         else:
-            logger.error(f"[{'DRY RUN - ' if DRY_RUN else ''}Verification failed] Records from {table} with UUID: {uuid} were not fully deleted. Remaining count: {count}")
+            logger.error(f"[{'DRY RUN - ' if DRY_RUN else ''}Verification failed] Records from {table} with UUID: {uuid} were not fully deleted.")
 
 def group_folders_by_dados_id(folders):
     grouped_folders = {}
@@ -135,7 +148,7 @@ def group_folders_by_dados_id(folders):
     return grouped_folders
 
 def extract_dados_id(folder_name):
-    match = re.search(r"\d+T\d+-(\d+)-", folder_name)
+    match = DADOS_ID_RE.search(folder_name)
     return match.group(1) if match else None
 
 def handle_duplicate_folders(folders):
@@ -11,28 +11,30 @@ STAGING_BUCKET = 'z316-staging'
 TARGET_PDV_TABLE = 'emporio-zingaro.z316_tiny_raw_json.pdv'
 TARGET_PESQUISA_TABLE = 'emporio-zingaro.z316_tiny_raw_json.pesquisa'
 FIX = False
+FOLDER_RE = re.compile(r'(\d+T\d+)-(\d+)-([-\w]+)')
 
 def list_gcs_folders(bucket_name):
     client = storage.Client()
     bucket = client.bucket(bucket_name)
-    blobs = client.list_blobs(bucket)
+    blobs = client.list_blobs(bucket, match_glob="[0-9]*T[0-9]*-[0-9]*-**", fields="items(name),nextPageToken")
     ids = set()
-    folder_paths = []
+    id_path_pairs = []
     for blob in blobs:
-        match = re.match(r'(\d+T\d+)-(\d+)-([-\w]+)', blob.name)
+        match = FOLDER_RE.match(blob.name)
         if match:
             ids.add(match.group(2))
-            folder_paths.append(blob.name)
+            id_path_pairs.append((match.group(2), blob.name))
             logging.debug(f"Found ID: {match.group(2)} from {blob.name}")
-    return ids, folder_paths
+    return frozenset(ids), id_path_pairs
 
 def fetch_sale_ids_from_bigquery(table_name):
     client = bigquery.Client()
     query = f"SELECT id FROM `{table_name}`"
-    df = client.query(query).to_dataframe()
+    rows = client.query(query).result()
+    sale_ids = frozenset(str(row[0]) for row in rows)
 
-    logging.debug(f"Fetched IDs from {table_name} into DataFrame")
-    return set(df['id'].astype(str))
+    logging.debug(f"Fetched {len(sale_ids)} IDs from {table_name}")
+    return sale_ids
 
 def find_missing_ids(gcs_ids, pdv_ids, pesquisa_ids):
     missing_in_pdv = pdv_ids - gcs_ids
@@ -81,14 +83,15 @@ def move_folders_for_triggering(bucket_name, staging_bucket_name, folder_paths):
 def main():
     logging.info("Starting the script...")
 
-    gcs_ids, folder_paths = list_gcs_folders(TARGET_BUCKET)
+    gcs_ids, id_path_pairs = list_gcs_folders(TARGET_BUCKET)
     pdv_ids = fetch_sale_ids_from_bigquery(TARGET_PDV_TABLE)
     pesquisa_ids = fetch_sale_ids_from_bigquery(TARGET_PESQUISA_TABLE)
     missing_in_both_tables = find_missing_ids(gcs_ids, pdv_ids, pesquisa_ids)
 
     if FIX:
         logging.info("Moving folders to trigger the Cloud Function...")
-        move_folders_for_triggering(TARGET_BUCKET, STAGING_BUCKET, [path for path in folder_paths if re.search(r'(\d+T\d+)-(\d+)-([-\w]+)', path).group(2) in missing_in_both_tables])
+        folder_paths = [path for sale_id, path in id_path_pairs if sale_id in missing_in_both_tables]
+        move_folders_for_triggering(TARGET_BUCKET, STAGING_BUCKET, folder_paths)
 
     logging.info("Script completed successfully.")
 
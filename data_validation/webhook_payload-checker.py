@@ -1,11 +1,15 @@
-import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import google.cloud.storage as storage
+from requests.adapters import HTTPAdapter
 
 logging.basicConfig(level=logging.INFO)
 
 BUCKET_NAME = "z316-tiny-webhook"
 DRY_RUN = False
+MAX_WORKERS = 32
+DELETE_BATCH_SIZE = 100
 
 def validate_payload(data):
     required_fields = ["versao", "cnpj", "tipo", "dados"]
@@ -18,7 +22,7 @@ def validate_payload(data):
     return True
 
 def check_file_for_deletion(blob):
-    data = json.loads(blob.download_as_string())
+    data = orjson.loads(blob.download_as_bytes())
     is_valid = validate_payload(data)
 
     if not is_valid:
@@ -28,28 +32,36 @@ def check_file_for_deletion(blob):
         logging.info(f"File {blob.name} meets all validation criteria. Skipping deletion.")
         return False
 
+def check_blob(blob):
+    try:
+        return check_file_for_deletion(blob)
+    except Exception as e:
+        logging.error(f"Error processing file {blob.name}: {e}")
+        return False
+
 def delete_marked_files(storage_client, files_to_delete):
-    for blob in files_to_delete:
+    for start in range(0, len(files_to_delete), DELETE_BATCH_SIZE):
+        batch_blobs = files_to_delete[start:start + DELETE_BATCH_SIZE]
         if DRY_RUN:
-            logging.info(f"DRY RUN: Would delete {blob.name}")
-        else:
-            logging.info(f"Deleting {blob.name}")
-            blob.delete()
+            for blob in batch_blobs:
+                logging.info(f"DRY RUN: Would delete {blob.name}")
+            continue
+        with storage_client.batch():
+            for blob in batch_blobs:
+                logging.info(f"Deleting {blob.name}")
+                blob.delete()
 
 def main():
     storage_client = storage.Client()
+    storage_client._http.mount("https://", HTTPAdapter(pool_maxsize=MAX_WORKERS))
     bucket = storage_client.bucket(BUCKET_NAME)
 
 
     blobs = list(bucket.list_blobs(prefix="vendas/"))
-    files_to_delete = []
-
-    for blob in blobs:
-        try:
-            if check_file_for_deletion(blob):
-                files_to_delete.append(blob)
-        except Exception as e:
-            logging.error(f"Error processing file {blob.name}: {e}")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        marked_for_deletion = executor.map(check_blob, blobs)
+        files_to_delete = [blob for blob, marked in zip(blobs, marked_for_deletion) if marked]
 
     delete_marked_files(storage_client, files_to_delete)
 
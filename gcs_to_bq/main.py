@@ -1,15 +1,22 @@
+import io
 import re
+import gzip
 import os
-import json
 import base64
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Dict, List, Tuple, Optional
 
+import orjson
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
 from google.cloud import pubsub_v1
-from google.cloud import bigquery, storage
+from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
-from google.api_core import retry, exceptions
+from google.api_core import exceptions
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 DATASET_ID = os.getenv('DATASET_ID')
@@ -18,179 +25,215 @@ VERSION = os.getenv('VERSION')
 PROJECT_ID = os.getenv('PROJECT_ID')
 TOPIC_ID = os.getenv('TOPIC_ID')
 NOTIFY = os.getenv('NOTIFY', 'False').lower() == 'true'
+LOAD_JOB = os.getenv('LOAD_JOB', 'False').lower() == 'true'
+LOAD_JOB_MIN_ROWS = int(os.getenv('LOAD_JOB_MIN_ROWS', '100'))
+STREAMING_CHUNK_SIZE = 500
+STREAMING_MAX_WORKERS = 8
+HTTP_POOL_MAXSIZE = 32
+BR_DATE_RE = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
+
+PDV_SOURCE_ID = f"{SOURCE}-pdv_{VERSION}"
+PESQUISA_SOURCE_ID = f"{SOURCE}-pesquisa_{VERSION}"
+PRODUTO_SOURCE_ID = f"{SOURCE}-produto_{VERSION}"
 
 logging.basicConfig(level=logging.INFO)
 
-PDV_SCHEMA =[
-    bigquery.SchemaField("uuid", "STRING"),
-    bigquery.SchemaField("timestamp", "TIMESTAMP"),
-	bigquery.SchemaField("id", "INTEGER"),
-	bigquery.SchemaField("numero", "INTEGER"),
-	bigquery.SchemaField("data", "DATE"),
-	bigquery.SchemaField("frete", "FLOAT"),
-	bigquery.SchemaField("desconto", "STRING"),
-	bigquery.SchemaField("valorICMSSubst", "FLOAT"),
-	bigquery.SchemaField("valorIPI", "FLOAT"),
-	bigquery.SchemaField("totalProdutos", "FLOAT"),
-	bigquery.SchemaField("totalVenda", "FLOAT"),
-	bigquery.SchemaField("fretePorConta", "STRING"),
-	bigquery.SchemaField("pesoLiquido", "FLOAT"),
-	bigquery.SchemaField("pesoBruto", "FLOAT"),
-	bigquery.SchemaField("observacoes", "STRING"),
-	bigquery.SchemaField("formaPagamento", "STRING"),
-	bigquery.SchemaField("situacao", "STRING"),
-	bigquery.SchemaField("contato", "RECORD", fields=[
-	bigquery.SchemaField("nome", "STRING"),
-	bigquery.SchemaField("fantasia", "STRING"),
-	bigquery.SchemaField("codigo", "STRING"),
-	bigquery.SchemaField("tipo", "STRING"),
-	bigquery.SchemaField("cpfCnpj", "STRING"),
-	bigquery.SchemaField("endereco", "STRING"),
-	bigquery.SchemaField("enderecoNro", "STRING"),
-	bigquery.SchemaField("complemento", "STRING"),
-	bigquery.SchemaField("bairro", "STRING"),
-	bigquery.SchemaField("cidade", "STRING"),
-	bigquery.SchemaField("uf", "STRING"),
-	bigquery.SchemaField("cep", "STRING"),
-	bigquery.SchemaField("fone", "STRING"),
-	bigquery.SchemaField("celular", "STRING"),
-	bigquery.SchemaField("email", "STRING"),
-	bigquery.SchemaField("inscricaoEstadual", "STRING"),
-	bigquery.SchemaField("indIEDest", "STRING"),
-	]),
-	bigquery.SchemaField("enderecoEntrega", "RECORD", fields=[
-	bigquery.SchemaField("nome", "STRING"),
-	bigquery.SchemaField("tipo", "STRING"),
-	bigquery.SchemaField("cpfCnpj", "STRING"),
-	bigquery.SchemaField("endereco", "STRING"),
-	bigquery.SchemaField("enderecoNro", "STRING"),
-	bigquery.SchemaField("complemento", "STRING"),
-	bigquery.SchemaField("bairro", "STRING"),
-	bigquery.SchemaField("cidade", "STRING"),
-	bigquery.SchemaField("uf", "STRING"),
-	bigquery.SchemaField("cep", "STRING"),
-	bigquery.SchemaField("fone", "STRING"),
-	]),
-	bigquery.SchemaField("itens", "RECORD", mode="REPEATED", fields=[
-	bigquery.SchemaField("id", "INTEGER"),
-	bigquery.SchemaField("idProduto", "INTEGER"),
-	bigquery.SchemaField("descricao", "STRING"),
-	bigquery.SchemaField("codigo", "STRING"),
-	bigquery.SchemaField("valor", "FLOAT"),
-	bigquery.SchemaField("quantidade", "FLOAT"),
-	bigquery.SchemaField("desconto", "STRING"),
-	bigquery.SchemaField("pesoLiquido", "FLOAT"),
-	bigquery.SchemaField("pesoBruto", "FLOAT"),
-	bigquery.SchemaField("unidade", "STRING"),
-	bigquery.SchemaField("tipo", "STRING"),
-	bigquery.SchemaField("ncm", "STRING"),
-	bigquery.SchemaField("origem", "STRING"),
-	bigquery.SchemaField("cest", "STRING"),
-	bigquery.SchemaField("gtin", "STRING"),
-	bigquery.SchemaField("gtinTributavel", "STRING"),
-	]),
-	bigquery.SchemaField("parcelas", "RECORD", mode="REPEATED", fields=[
-	bigquery.SchemaField("formaPagamento", "STRING"),
-	bigquery.SchemaField("dataVencimento", "DATE"),
-	bigquery.SchemaField("valor", "FLOAT"),
-	bigquery.SchemaField("tPag", "STRING"),
-	]),
-    bigquery.SchemaField("source_id", "STRING"),
-    bigquery.SchemaField("update_timestamp", "TIMESTAMP"),
+bq_client: Optional[bigquery.Client] = None
+ensured_tables: Dict[str, bigquery.TableReference] = {}
+pubsub_publisher: Optional[pubsub_v1.PublisherClient] = None
+pubsub_topic_path: Optional[str] = None
+pending_publishes: List[Tuple[str, Future]] = []
+
+PDV_SCHEMA_DEFINITION = [
+    {"name": "uuid", "type": "STRING"},
+    {"name": "timestamp", "type": "TIMESTAMP"},
+    {"name": "id", "type": "INTEGER"},
+    {"name": "numero", "type": "INTEGER"},
+    {"name": "data", "type": "DATE"},
+    {"name": "frete", "type": "FLOAT"},
+    {"name": "desconto", "type": "STRING"},
+    {"name": "valorICMSSubst", "type": "FLOAT"},
+    {"name": "valorIPI", "type": "FLOAT"},
+    {"name": "totalProdutos", "type": "FLOAT"},
+    {"name": "totalVenda", "type": "FLOAT"},
+    {"name": "fretePorConta", "type": "STRING"},
+    {"name": "pesoLiquido", "type": "FLOAT"},
+    {"name": "pesoBruto", "type": "FLOAT"},
+    {"name": "observacoes", "type": "STRING"},
+    {"name": "formaPagamento", "type": "STRING"},
+    {"name": "situacao", "type": "STRING"},
+    {"name": "contato", "type": "RECORD", "fields": [
+        {"name": "nome", "type": "STRING"},
+        {"name": "fantasia", "type": "STRING"},
+        {"name": "codigo", "type": "STRING"},
+        {"name": "tipo", "type": "STRING"},
+        {"name": "cpfCnpj", "type": "STRING"},
+        {"name": "endereco", "type": "STRING"},
+        {"name": "enderecoNro", "type": "STRING"},
+        {"name": "complemento", "type": "STRING"},
+        {"name": "bairro", "type": "STRING"},
+        {"name": "cidade", "type": "STRING"},
+        {"name": "uf", "type": "STRING"},
+        {"name": "cep", "type": "STRING"},
+        {"name": "fone", "type": "STRING"},
+        {"name": "celular", "type": "STRING"},
+        {"name": "email", "type": "STRING"},
+        {"name": "inscricaoEstadual", "type": "STRING"},
+        {"name": "indIEDest", "type": "STRING"}
+    ]},
+    {"name": "enderecoEntrega", "type": "RECORD", "fields": [
+        {"name": "nome", "type": "STRING"},
+        {"name": "tipo", "type": "STRING"},
+        {"name": "cpfCnpj", "type": "STRING"},
+        {"name": "endereco", "type": "STRING"},
+        {"name": "enderecoNro", "type": "STRING"},
+        {"name": "complemento", "type": "STRING"},
+        {"name": "bairro", "type": "STRING"},
+        {"name": "cidade", "type": "STRING"},
+        {"name": "uf", "type": "STRING"},
+        {"name": "cep", "type": "STRING"},
+        {"name": "fone", "type": "STRING"}
+    ]},
+    {"name": "itens", "type": "RECORD", "mode": "REPEATED", "fields": [
+        {"name": "id", "type": "INTEGER"},
+        {"name": "idProduto", "type": "INTEGER"},
+        {"name": "descricao", "type": "STRING"},
+        {"name": "codigo", "type": "STRING"},
+        {"name": "valor", "type": "FLOAT"},
+        {"name": "quantidade", "type": "FLOAT"},
+        {"name": "desconto", "type": "STRING"},
+        {"name": "pesoLiquido", "type": "FLOAT"},
+        {"name": "pesoBruto", "type": "FLOAT"},
+        {"name": "unidade", "type": "STRING"},
+        {"name": "tipo", "type": "STRING"},
+        {"name": "ncm", "type": "STRING"},
+        {"name": "origem", "type": "STRING"},
+        {"name": "cest", "type": "STRING"},
+        {"name": "gtin", "type": "STRING"},
+        {"name": "gtinTributavel", "type": "STRING"}
+    ]},
+    {"name": "parcelas", "type": "RECORD", "mode": "REPEATED", "fields": [
+        {"name": "formaPagamento", "type": "STRING"},
+        {"name": "dataVencimento", "type": "DATE"},
+        {"name": "valor", "type": "FLOAT"},
+        {"name": "tPag", "type": "STRING"}
+    ]},
+    {"name": "source_id", "type": "STRING"},
+    {"name": "update_timestamp", "type": "TIMESTAMP"}
 ]
 
 
-PESQUISA_SCHEMA =[
-    bigquery.SchemaField("uuid", "STRING"),
-    bigquery.SchemaField("timestamp", "TIMESTAMP"),
-    bigquery.SchemaField("id", "STRING"),
-    bigquery.SchemaField("numero", "STRING"),
-    bigquery.SchemaField("numero_ecommerce", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("data_pedido", "DATE"),
-    bigquery.SchemaField("data_prevista", "DATE", mode="NULLABLE"),
-    bigquery.SchemaField("nome", "STRING"),
-    bigquery.SchemaField("valor", "FLOAT"),
-    bigquery.SchemaField("id_vendedor", "STRING"),
-    bigquery.SchemaField("nome_vendedor", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("situacao", "STRING"),
-    bigquery.SchemaField("codigo_rastreamento", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("url_rastreamento", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("source_id", "STRING"),
-    bigquery.SchemaField("update_timestamp", "TIMESTAMP"),
+PESQUISA_SCHEMA_DEFINITION = [
+    {"name": "uuid", "type": "STRING"},
+    {"name": "timestamp", "type": "TIMESTAMP"},
+    {"name": "id", "type": "STRING"},
+    {"name": "numero", "type": "STRING"},
+    {"name": "numero_ecommerce", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "data_pedido", "type": "DATE"},
+    {"name": "data_prevista", "type": "DATE", "mode": "NULLABLE"},
+    {"name": "nome", "type": "STRING"},
+    {"name": "valor", "type": "FLOAT"},
+    {"name": "id_vendedor", "type": "STRING"},
+    {"name": "nome_vendedor", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "situacao", "type": "STRING"},
+    {"name": "codigo_rastreamento", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "url_rastreamento", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "source_id", "type": "STRING"},
+    {"name": "update_timestamp", "type": "TIMESTAMP"}
 ]
 
 
-PRODUTO_SCHEMA =[
-    bigquery.SchemaField("uuid", "STRING"),
-    bigquery.SchemaField("timestamp", "TIMESTAMP"),
-    bigquery.SchemaField("id", "INTEGER"),
-    bigquery.SchemaField("nome", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("codigo", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("unidade", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("preco", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("preco_promocional", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("ncm", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("origem", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("gtin", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("gtin_embalagem", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("localizacao", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("peso_liquido", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("peso_bruto", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("estoque_minimo", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("estoque_maximo", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("id_fornecedor", "INTEGER", mode="NULLABLE"),
-    bigquery.SchemaField("nome_fornecedor", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("codigo_fornecedor", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("codigo_pelo_fornecedor", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("unidade_por_caixa", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("preco_custo", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("preco_custo_medio", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("situacao", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("tipo", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("classe_ipi", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("valor_ipi_fixo", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("cod_lista_servicos", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("descricao_complementar", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("garantia", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("cest", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("obs", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("tipoVariacao", "STRING"),
-    bigquery.SchemaField("variacoes", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("idProdutoPai", "INTEGER", mode="NULLABLE"),
-    bigquery.SchemaField("sob_encomenda", "STRING"),
-    bigquery.SchemaField("dias_preparacao", "INTEGER", mode="NULLABLE"),
-    bigquery.SchemaField("marca", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("tipoEmbalagem", "INTEGER", mode="NULLABLE"),
-    bigquery.SchemaField("alturaEmbalagem", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("larguraEmbalagem", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("comprimentoEmbalagem", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("diametroEmbalagem", "FLOAT", mode="NULLABLE"),
-    bigquery.SchemaField("qtd_volumes", "INTEGER", mode="NULLABLE"),
-    bigquery.SchemaField("categoria", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("anexos", "RECORD", mode="REPEATED", fields=[
-        bigquery.SchemaField("anexo", "STRING"),
-    ]),
-    bigquery.SchemaField("imagens_externas", "RECORD", mode="REPEATED", fields=[
-        bigquery.SchemaField("url", "STRING"),
-    ]),
-    bigquery.SchemaField("classe_produto", "STRING"),
-    bigquery.SchemaField("seo_title", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("seo_keywords", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("link_video", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("seo_description", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("slug", "STRING", mode="NULLABLE"),
-    bigquery.SchemaField("source_id", "STRING"),
-    bigquery.SchemaField("update_timestamp", "TIMESTAMP"),
+PRODUTO_SCHEMA_DEFINITION = [
+    {"name": "uuid", "type": "STRING"},
+    {"name": "timestamp", "type": "TIMESTAMP"},
+    {"name": "id", "type": "INTEGER"},
+    {"name": "nome", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "codigo", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "unidade", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "preco", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "preco_promocional", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "ncm", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "origem", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "gtin", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "gtin_embalagem", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "localizacao", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "peso_liquido", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "peso_bruto", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "estoque_minimo", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "estoque_maximo", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "id_fornecedor", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "nome_fornecedor", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "codigo_fornecedor", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "codigo_pelo_fornecedor", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "unidade_por_caixa", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "preco_custo", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "preco_custo_medio", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "situacao", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "tipo", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "classe_ipi", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "valor_ipi_fixo", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "cod_lista_servicos", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "descricao_complementar", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "garantia", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "cest", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "obs", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "tipoVariacao", "type": "STRING"},
+    {"name": "variacoes", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "idProdutoPai", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "sob_encomenda", "type": "STRING"},
+    {"name": "dias_preparacao", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "marca", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "tipoEmbalagem", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "alturaEmbalagem", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "larguraEmbalagem", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "comprimentoEmbalagem", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "diametroEmbalagem", "type": "FLOAT", "mode": "NULLABLE"},
+    {"name": "qtd_volumes", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "categoria", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "anexos", "type": "RECORD", "mode": "REPEATED", "fields": [
+        {"name": "anexo", "type": "STRING"}
+    ]},
+    {"name": "imagens_externas", "type": "RECORD", "mode": "REPEATED", "fields": [
+        {"name": "url", "type": "STRING"}
+    ]},
+    {"name": "classe_produto", "type": "STRING"},
+    {"name": "seo_title", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "seo_keywords", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "link_video", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "seo_description", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "slug", "type": "STRING", "mode": "NULLABLE"},
+    {"name": "source_id", "type": "STRING"},
+    {"name": "update_timestamp", "type": "TIMESTAMP"}
 ]
 
-DATA_TYPE_MAPPING = {
-    'pedidos.pesquisa': {'table_name': 'pesquisa', 'schema': PESQUISA_SCHEMA},
-    'pdv.pedido': {'table_name': 'pdv', 'schema': PDV_SCHEMA},
-    'produto': {'table_name': 'produto', 'schema': PRODUTO_SCHEMA}
+SCHEMA_DEFINITIONS = {
+    'pdv': PDV_SCHEMA_DEFINITION,
+    'pesquisa': PESQUISA_SCHEMA_DEFINITION,
+    'produto': PRODUTO_SCHEMA_DEFINITION
 }
 
+schemas: Dict[str, List[bigquery.SchemaField]] = {}
+
+
+def get_schema(table_name: str) -> List[bigquery.SchemaField]:
+    if table_name not in schemas:
+        schemas[table_name] = [bigquery.SchemaField.from_api_repr(field) for field in SCHEMA_DEFINITIONS[table_name]]
+    return schemas[table_name]
+
+
+def get_bq_client() -> bigquery.Client:
+    global bq_client
+    if bq_client is None:
+        credentials, project = google.auth.default(scopes=bigquery.Client.SCOPE)
+        session = AuthorizedSession(credentials)
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE))
+        bq_client = bigquery.Client(project=project, credentials=credentials, _http=session)
+    return bq_client
+
 
-def ensure_table_exists(client: bigquery.Client, table_id: str, schema: List[bigquery.SchemaField]) -> None:
+def ensure_table_exists(client: bigquery.Client, table_id: str) -> bigquery.TableReference:
+    if table_id in ensured_tables:
+        return ensured_tables[table_id]
     logging.debug(f"Checking if table {table_id} exists")
     dataset_ref = client.dataset(DATASET_ID, project=PROJECT_ID)
     table_ref = dataset_ref.table(table_id)
@@ -199,10 +242,12 @@ def ensure_table_exists(client: bigquery.Client, table_id: str, schema: List[big
         logging.debug(f"Table {table_id} already exists.")
     except NotFound:
         logging.info(f"Table {table_id} does not exist. Creating table with day-partitioning on 'timestamp'.")
-        table = bigquery.Table(table_ref, schema=schema)
+        table = bigquery.Table(table_ref, schema=get_schema(table_id))
         table.time_partitioning = bigquery.TimePartitioning(field="timestamp")
         client.create_table(table)
         logging.info(f"Table {table_id} created successfully.")
+    ensured_tables[table_id] = table_ref
+    return table_ref
 
 
 def log_bigquery_reference(client: bigquery.Client, dataset_id: str, table_id: str) -> None:
@@ -210,54 +255,126 @@ def log_bigquery_reference(client: bigquery.Client, dataset_id: str, table_id: s
     logging.info(f"BigQuery table reference: {full_table_id}")
 
 
-def transform_date_format(date_str: str) -> str:
+def transform_date_format(date_str: str) -> Optional[str]:
+    if not date_str:
+        return None
+    return convert_date_format(date_str)
+
+
+@lru_cache(maxsize=4096)
+def convert_date_format(date_str: str) -> str:
     logging.debug(f"Transforming date format for: {date_str}")
-    try:
-        transformed_date = datetime.strptime(date_str, "%d/%m/%Y").strftime("%Y-%m-%d")
+    match = BR_DATE_RE.fullmatch(date_str)
+    if match:
+        day, month, year = match.groups()
+        transformed_date = f"{year}-{month}-{day}"
         logging.debug(f"Transformed date: {transformed_date}")
         return transformed_date
-    except ValueError as e:
-        logging.warning(f"Error transforming date format: {e}")
-        return date_str
+    logging.warning(f"Error transforming date format: unexpected value {date_str!r}")
+    return date_str
+
+
+def transform_timestamp_format(timestamp: str) -> str:
+    return f"{timestamp[0:4]}-{timestamp[4:6]}-{timestamp[6:8]}T{timestamp[9:11]}:{timestamp[11:13]}:{timestamp[13:15]}"
+
+
+def get_publisher() -> Tuple[pubsub_v1.PublisherClient, str]:
+    global pubsub_publisher, pubsub_topic_path
+    if pubsub_publisher is None:
+        pubsub_publisher = pubsub_v1.PublisherClient(
+            batch_settings=pubsub_v1.types.BatchSettings(max_messages=100, max_bytes=1_000_000, max_latency=0.05)
+        )
+        pubsub_topic_path = pubsub_publisher.topic_path(PROJECT_ID, TOPIC_ID)
+    return pubsub_publisher, pubsub_topic_path
 
 
-@retry(retry=retry_if_exception_type(exceptions.DeadlineExceeded), wait=wait_exponential(multiplier=1, min=4, max=60), stop=stop_after_attempt(3))
 def publish_to_pubsub(uuid: str) -> None:
     if not NOTIFY:
         logging.info(f"Notification disabled. Skipping publishing message to {TOPIC_ID} with UUID: {uuid}")
         return
-    try:
-        logging.info(f"Publishing message to {TOPIC_ID} with UUID: {uuid}")
-        publisher = pubsub_v1.PublisherClient()
-        topic_path = publisher.topic_path(PROJECT_ID, TOPIC_ID)
-        message_data = json.dumps({"pedido_uuid": uuid}).encode("utf-8")
-        future = publisher.publish(topic_path, message_data)
-        future.result(timeout=30)
-        logging.info(f"Published message to {TOPIC_ID} with UUID: {uuid}")
-    except exceptions.DeadlineExceeded:
-        logging.error(f"Timeout occurred while publishing message to {TOPIC_ID} with UUID: {uuid}")
-        raise
-    except Exception as e:
-        logging.error(f"An unexpected error occurred while publishing message to {TOPIC_ID} with UUID: {uuid}: {e}")
+    publisher, topic_path = get_publisher()
+    logging.info(f"Publishing message to {TOPIC_ID} with UUID: {uuid}")
+    future = publisher.publish(topic_path, orjson.dumps({"pedido_uuid": uuid}))
+    pending_publishes.append((uuid, future))
+
+
+def wait_for_publishes() -> None:
+    for uuid, future in pending_publishes:
+        try:
+            future.result(timeout=30)
+            logging.info(f"Published message to {TOPIC_ID} with UUID: {uuid}")
+        except exceptions.DeadlineExceeded:
+            logging.error(f"Timeout occurred while publishing message to {TOPIC_ID} with UUID: {uuid}")
+        except Exception as e:
+            logging.error(f"An unexpected error occurred while publishing message to {TOPIC_ID} with UUID: {uuid}: {e}")
+    pending_publishes.clear()
 
 
 @retry(retry=retry_if_exception_type(exceptions.ServerError), wait=wait_exponential(multiplier=1, min=4, max=60), stop=stop_after_attempt(3))
-def insert_rows_with_retry(client: bigquery.Client, table_ref: bigquery.TableReference, rows: List[Dict[str, Any]]) -> None:
+def insert_rows_with_retry(client: bigquery.Client, table_ref: bigquery.TableReference, rows: List[Dict[str, Any]], row_ids: List[str]) -> List[Dict[str, Any]]:
     logging.info(f"Inserting {len(rows)} rows into {table_ref.table_id}")
     try:
-        errors = client.insert_rows_json(table_ref, rows)
+        errors = client.insert_rows_json(table_ref, rows, row_ids=row_ids)
         if errors:
             logging.error(f"Errors streaming data to BigQuery: {errors}")
         else:
             logging.info(f"Data streamed successfully to {table_ref.table_id}.")
+        return errors
     except exceptions.ServerError as e:
         logging.error(f"Server error occurred while inserting rows to {table_ref.table_id}: {e}")
         raise
 
 
-def transform_and_load_pdv_data(client: bigquery.Client, pdv_data: dict, uuid: str, timestamp: str) -> None:
+def insert_rows_in_chunks(client: bigquery.Client, table_ref: bigquery.TableReference, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    row_ids = [f"{row['uuid']}-{index}" for index, row in enumerate(rows)]
+    starts = range(0, len(rows), STREAMING_CHUNK_SIZE)
+    if len(starts) == 1:
+        return insert_rows_with_retry(client, table_ref, rows, row_ids)
+    with ThreadPoolExecutor(max_workers=min(STREAMING_MAX_WORKERS, len(starts))) as executor:
+        chunk_errors = executor.map(
+            lambda start: insert_rows_with_retry(client, table_ref, rows[start:start + STREAMING_CHUNK_SIZE], row_ids[start:start + STREAMING_CHUNK_SIZE]),
+            starts
+        )
+        return [error for errors in chunk_errors for error in errors]
+
+
+@retry(retry=retry_if_exception_type(exceptions.ServerError), wait=wait_exponential(multiplier=1, min=4, max=60), stop=stop_after_attempt(3))
+def load_rows_with_retry(client: bigquery.Client, table_ref: bigquery.TableReference, rows: List[Dict[str, Any]], schema: List[bigquery.SchemaField]) -> List[Dict[str, Any]]:
+    logging.info(f"Loading {len(rows)} rows into {table_ref.table_id} with a load job")
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        schema=schema,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+    )
+    ndjson = io.BytesIO()
+    with gzip.GzipFile(fileobj=ndjson, mode='wb', compresslevel=6) as compressed:
+        for row in rows:
+            compressed.write(orjson.dumps(row))
+            compressed.write(b"\n")
+    ndjson.seek(0)
+    try:
+        load_job = client.load_table_from_file(ndjson, table_ref, job_config=job_config)
+        load_job.result()
+        logging.info(f"Data loaded successfully to {table_ref.table_id}.")
+        return []
+    except exceptions.ServerError as e:
+        logging.error(f"Server error occurred while loading rows to {table_ref.table_id}: {e}")
+        raise
+    except exceptions.BadRequest as e:
+        logging.error(f"Errors loading data to BigQuery: {e}")
+        return [{'message': str(e)}]
+
+
+def write_rows(client: bigquery.Client, table_ref: bigquery.TableReference, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if LOAD_JOB or len(rows) >= LOAD_JOB_MIN_ROWS:
+        return load_rows_with_retry(client, table_ref, rows, get_schema(table_ref.table_id))
+    return insert_rows_in_chunks(client, table_ref, rows)
+
+
+def transform_and_load_pdv_data(client: bigquery.Client, table_ref: bigquery.TableReference, pdv_data: dict, uuid: str, timestamp: str) -> None:
     logging.info("Transforming and loading PDV data.")
-    ensure_table_exists(client, 'pdv', PDV_SCHEMA)
+
+    update_timestamp = datetime.utcnow().isoformat()
 
     pedido_data = pdv_data['retorno']['pedido']
 
@@ -269,28 +386,35 @@ def transform_and_load_pdv_data(client: bigquery.Client, pdv_data: dict, uuid: s
             if 'dataVencimento' in parcela:
                 parcela['dataVencimento'] = transform_date_format(parcela['dataVencimento'])
 
-    pedido_data.update({
+    row = {
+        **pedido_data,
         'uuid': uuid,
-        'timestamp': datetime.strptime(timestamp, "%Y%m%dT%H%M%S").isoformat(),
-        'source_id': f"{SOURCE}-pdv_{VERSION}",
-        'update_timestamp': datetime.utcnow().isoformat()
-    })
+        'timestamp': timestamp,
+        'source_id': PDV_SOURCE_ID,
+        'update_timestamp': update_timestamp
+    }
 
     log_bigquery_reference(client, DATASET_ID, 'pdv')
 
-    table_ref = client.dataset(DATASET_ID).table('pdv')
-    insert_rows_with_retry(client, table_ref, [pedido_data])
+    errors = write_rows(client, table_ref, [row])
 
-    if NOTIFY:
+    if NOTIFY and not errors:
         publish_to_pubsub(uuid)
 
     logging.info("PDV data transformation and loading completed.")
 
 
-def transform_and_load_pesquisa_data(client: bigquery.Client, pesquisa_data: dict, uuid: str, timestamp: str) -> None:
+def transform_and_load_pesquisa_data(client: bigquery.Client, table_ref: bigquery.TableReference, pesquisa_data: dict, uuid: str, timestamp: str) -> None:
     logging.info("Transforming and loading Pesquisa data.")
-    ensure_table_exists(client, 'pesquisa', PESQUISA_SCHEMA)
 
+    static_fields = {
+        'uuid': uuid,
+        'timestamp': timestamp,
+        'source_id': PESQUISA_SOURCE_ID,
+        'update_timestamp': datetime.utcnow().isoformat()
+    }
+
+    rows = []
     for pedido in pesquisa_data['retorno']['pedidos']:
         pedido_data = pedido['pedido']
 
@@ -302,71 +426,74 @@ def transform_and_load_pesquisa_data(client: bigquery.Client, pesquisa_data: dic
         else:
             del pedido_data['data_prevista']
 
-        pedido_data.update({
-            'uuid': uuid,
-            'timestamp': datetime.strptime(timestamp, "%Y%m%dT%H%M%S").isoformat(),
-            'source_id': f"{SOURCE}-pesquisa_{VERSION}",
-            'update_timestamp': datetime.utcnow().isoformat()
-        })
+        rows.append({**pedido_data, **static_fields})
 
-        log_bigquery_reference(client, DATASET_ID, 'pesquisa')
+    if not rows:
+        logging.debug("Received pesquisa data without pedidos.")
+        return
 
-        table_ref = client.dataset(DATASET_ID).table('pesquisa')
+    log_bigquery_reference(client, DATASET_ID, 'pesquisa')
 
-        insert_rows_with_retry(client, table_ref, [pedido_data])
+    errors = write_rows(client, table_ref, rows)
 
-        if NOTIFY:
-            publish_to_pubsub(uuid)
+    if NOTIFY and not errors:
+        publish_to_pubsub(uuid)
 
     logging.info("Pesquisa data transformation and loading completed.")
 
 
-def transform_and_load_produto_data(client: bigquery.Client, produto_data: dict, uuid: str, timestamp: str) -> None:
+def transform_and_load_produto_data(client: bigquery.Client, table_ref: bigquery.TableReference, produto_data_list: list, uuid: str, timestamp: str) -> None:
     logging.info("Transforming and loading Produto data.")
-    ensure_table_exists(client, 'produto', PRODUTO_SCHEMA)
 
-    if not produto_data:
-        logging.debug("Received empty produto data.")
-        return
-
-    produto_data.update({
+    static_fields = {
         'uuid': uuid,
-        'timestamp': datetime.strptime(timestamp, "%Y%m%dT%H%M%S").isoformat(),
-        'source_id': f"{SOURCE}-produto_{VERSION}",
+        'timestamp': timestamp,
+        'source_id': PRODUTO_SOURCE_ID,
         'update_timestamp': datetime.utcnow().isoformat()
-    })
+    }
 
-    log_bigquery_reference(client, DATASET_ID, 'produto')
+    rows = [
+        {**produto_data["retorno"]["produto"], **static_fields}
+        for produto_data in produto_data_list
+        if produto_data.get("retorno", {}).get("produto")
+    ]
 
-    table_ref = client.dataset(DATASET_ID).table('produto')
+    if not rows:
+        logging.debug("Received empty produto data.")
+        return
 
-    insert_rows_with_retry(client, table_ref, [produto_data])
+    log_bigquery_reference(client, DATASET_ID, 'produto')
 
-    if NOTIFY:
+    errors = write_rows(client, table_ref, rows)
+
+    if NOTIFY and not errors:
         publish_to_pubsub(uuid)
 
     logging.info("Produto data transformation and loading completed.")
 
 
+MESSAGE_TRANSFORMERS = {
+    'pdv_pedido_data': ('pdv', transform_and_load_pdv_data),
+    'produto_data': ('produto', transform_and_load_produto_data),
+    'pedidos_pesquisa_data': ('pesquisa', transform_and_load_pesquisa_data)
+}
+
+
 def cloud_function_entry_point(event: dict, context: Any) -> None:
     logging.info(f"Cloud Function triggered by Pub/Sub message: {event}")
-    client = bigquery.Client()
-    message_data = base64.b64decode(event['data']).decode('utf-8')
-    message_json = json.loads(message_data)
+    client = get_bq_client()
+    message_json = orjson.loads(base64.b64decode(event['data']))
     uuid = message_json.get("uuid")
     timestamp = message_json.get("timestamp")
     if not uuid or not timestamp:
         logging.error("UUID or Timestamp missing in Pub/Sub message.")
         return
-    if "pdv_pedido_data" in message_json:
-        pdv_pedido_data = message_json["pdv_pedido_data"]
-        transform_and_load_pdv_data(client, pdv_pedido_data, uuid, timestamp)
-    if "produto_data" in message_json:
-        produto_data_list = message_json["produto_data"]
-        for produto_data in produto_data_list:
-            if "retorno" in produto_data and "produto" in produto_data["retorno"]:
-                transform_and_load_produto_data(client, produto_data["retorno"]["produto"], uuid, timestamp)
-    if "pedidos_pesquisa_data" in message_json:
-        pedidos_pesquisa_data = message_json["pedidos_pesquisa_data"]
-        transform_and_load_pesquisa_data(client, pedidos_pesquisa_data, uuid, timestamp)
+    timestamp = transform_timestamp_format(timestamp)
+    try:
+        for message_key, (table_name, transformer) in MESSAGE_TRANSFORMERS.items():
+            if message_key in message_json:
+                table_ref = ensure_table_exists(client, table_name)
+                transformer(client, table_ref, message_json[message_key], uuid, timestamp)
+    finally:
+        wait_for_publishes()
     logging.info("Processing completed for Pub/Sub message.")
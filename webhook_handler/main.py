@@ -1,36 +1,59 @@
-import json
 import os
+import gzip
 import logging
 import sys
-from datetime import datetime, timezone
+import time
 import uuid
+import orjson
 from flask import abort, make_response, jsonify
+from google.api_core.exceptions import PreconditionFailed
 from google.cloud import storage
-from tenacity import retry, wait_exponential, stop_after_attempt, before_log
+from google.cloud.storage.retry import DEFAULT_RETRY
+from requests.adapters import HTTPAdapter
 
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 FILENAME_FORMAT = os.getenv("FILENAME_FORMAT")
+HTTP_POOL_MAXSIZE = 64
+UPLOAD_TIMEOUT = 30
+UPLOAD_RETRY = DEFAULT_RETRY.with_deadline(60).with_delay(initial=1.0, maximum=30.0, multiplier=2.0)
+REQUIRED_FIELDS = frozenset(("versao", "cnpj", "tipo", "dados"))
+TIPO_MISMATCH_MESSAGE = "Payload 'tipo' is not 'inclusao_pedido'"
 
-logger = logging.getLogger()
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+logger.addHandler(log_handler)
+logger.propagate = False
 
-storage_client = storage.Client()
+storage_client = None
+bucket = None
+
+def get_bucket():
+    """Return the target bucket, creating the storage client on first use."""
+    global storage_client, bucket
+    if bucket is None:
+        storage_client = storage.Client()
+        storage_client._http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE))
+        bucket = storage_client.bucket(BUCKET_NAME)
+    return bucket
 
-@retry(wait=wait_exponential(multiplier=1, max=10),
-       stop=stop_after_attempt(3),
-       before=before_log(logger, logging.DEBUG))
 def upload_to_gcs(blob, data):
     """Upload data to Google Cloud Storage."""
-    blob.upload_from_string(data, content_type='application/json')
-    logger.info(f"Successfully uploaded {blob.name}")
+    try:
+        blob.upload_from_string(data, content_type='application/json', timeout=UPLOAD_TIMEOUT,
+                                retry=UPLOAD_RETRY, if_generation_match=0, checksum='crc32c')
+    except PreconditionFailed:
+        logger.info("%s was already stored by an earlier attempt", blob.name)
+        return
+    logger.info("Successfully uploaded %s", blob.name)
 
 def validate_payload(request_data):
     """Validate the incoming request payload."""
-    required_fields = ["versao", "cnpj", "tipo", "dados"]
-    if not all(field in request_data for field in required_fields):
+    if not REQUIRED_FIELDS.issubset(request_data):
         raise ValueError("Payload missing required fields")
     if request_data["tipo"] != "inclusao_pedido":
-        raise ValueError("Payload 'tipo' is not 'inclusao_pedido'")
+        raise ValueError(TIPO_MISMATCH_MESSAGE)
 
 def generate_filename(dados_id, timestamp, unique_id):
     """Generate a filename for the storage blob."""
@@ -47,28 +70,30 @@ def erp_webhook_handler(request):
         return make_response('No payload found', 400)
 
     try:
-        request_data = request.get_json(force=True)
+        request_data = orjson.loads(request.data)
         validate_payload(request_data)
     except ValueError as e:
-        if str(e) == "Payload 'tipo' is not 'inclusao_pedido'":
-            logger.info(f"Ignored payload: {e}")
+        if str(e) == TIPO_MISMATCH_MESSAGE:
+            logger.info("Ignored payload: %s", e)
             return jsonify(message=f"Ignored payload: {e}"), 200
         else:
-            logger.error(f"Invalid payload: {e}")
+            logger.error("Invalid payload: %s", e)
             abort(400, description=f"Invalid payload: {e}")
 
-    dados_id = request_data.get("dados", {}).get("id", "unknown")
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    dados = request_data["dados"]
+    dados_id = dados.get("id", "unknown") if isinstance(dados, dict) else "unknown"
+    timestamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
     unique_id = uuid.uuid4()
     filename = generate_filename(dados_id, timestamp, unique_id)
 
-    blob = storage_client.bucket(BUCKET_NAME).blob(filename)
-    data = json.dumps(request_data)
+    blob = get_bucket().blob(filename)
+    blob.content_encoding = 'gzip'
+    data = gzip.compress(request.get_data(), compresslevel=1)
 
     try:
         upload_to_gcs(blob, data)
     except Exception as e:
-        logger.error(f"Failed to upload {filename} after retries: {e}")
+        logger.error("Failed to upload %s after retries: %s", filename, e)
         abort(500, description=f"Failed to upload {filename} after retries")
 
     return jsonify(message=f"Payload stored in {filename}", filename=filename), 200